@@ -0,0 +1,27 @@
+import hashlib
+import hmac
+from pyftpdlib.authorizers import AuthenticationFailed, DummyAuthorizer
+
+
+def _digest(value: str) -> bytes:
+    return hashlib.sha256(value.encode("utf-8", "surrogatepass")).digest()
+
+
+class SingleUserAuthorizer(DummyAuthorizer):
+    """Authorizer for the one account the add-on serves. Logins are checked in
+    constant time against digests, so the plaintext password isn't kept around.
+    """
+
+    def __init__(self, username: str, password: str, homedir: str, perm: str = "elr"):
+        DummyAuthorizer.__init__(self)
+        # Home dir, permissions and login/quit messages still come from the user table
+        self.add_user(username, "", homedir, perm=perm)
+        self._username_digest = _digest(username)
+        self._password_digest = _digest(password)
+
+    def validate_authentication(self, username, password, handler):
+        # Check both so a wrong username takes as long as a wrong password
+        username_ok = hmac.compare_digest(_digest(username), self._username_digest)
+        password_ok = hmac.compare_digest(_digest(password), self._password_digest)
+        if not (username_ok and password_ok):
+            raise AuthenticationFailed("Authentication failed.")
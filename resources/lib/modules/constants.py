@@ -4,3 +4,4 @@ import xbmcvfs
 addon = xbmcaddon.Addon()
 ADDON_NAME = addon.getAddonInfo("name")
 ADDON_PATH = xbmcvfs.translatePath(addon.getAddonInfo("path"))
+HOME_PATH = xbmcvfs.translatePath("special://home/")
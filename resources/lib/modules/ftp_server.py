@@ -1,34 +1,77 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import xbmc
-from pyftpdlib.authorizers import DummyAuthorizer
-from pyftpdlib.handlers import FTPHandler
-from pyftpdlib.servers import FTPServer
+from pyftpdlib.ioloop import IOLoop
+from modules.authorizers import SingleUserAuthorizer
 from modules.logger import log
 from modules.constants import ADDON_NAME
+from modules.handlers import CatFTPHandler, CatTLS_FTPHandler
+from modules.servers import CatFTPServer
 
 
-def run_ftp_server(root_dir: str, port: int, username: str, password: str, secure: bool):
+def _stop_when_set(server: CatFTPServer, shutdown_event: threading.Event):
+    shutdown_event.wait()
+    server.stop()
+
+
+def run_ftp_server(
+    root_dir: str,
+    port: int,
+    username: str,
+    password: str,
+    secure: bool,
+    shutdown_event: threading.Event = None,
+):
     server = None
+    dir_pool = None
     try:
-        authorizer = DummyAuthorizer()
-        authorizer.add_user(username, password, root_dir, perm="elradfmwMT")
-        handler = FTPHandler
-        handler.authorizer = authorizer
-        handler.log_prefix = f"[{ADDON_NAME}][pyftpdlib]: [%(username)s]@%(remote_ip)s -"
-        # TODO: Handle SSL in the future
+        authorizer = SingleUserAuthorizer(username, password, root_dir, perm="elradfmwMT")
+        if not secure:
+            base_handler = CatFTPHandler
+        elif CatTLS_FTPHandler is not None:
+            base_handler = CatTLS_FTPHandler
+        else:
+            raise RuntimeError("FTPS requires pyOpenSSL, which isn't installed")
+
+        # Directory listings stat() every entry; keep that off the IO loop when the Kodi
+        # home directory sits on slow or network storage
+        dir_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="catftp-list")
+
+        handler_attrs = {
+            "authorizer": authorizer,
+            "log_tag": f"[{ADDON_NAME}][pyftpdlib]",
+            # Serve RETR through sendfile(2) so file data never crosses into userspace
+            "use_sendfile": os.name == "posix" and hasattr(os, "sendfile"),
+            # ...and STOR through splice(2) for the same reason on the receiving side
+            "use_splice": hasattr(os, "splice"),
+            "dir_pool": dir_pool,
+        }
         if secure:
-            import ssl
+            handler_attrs.update(
+                tls_control_required=True,
+                tls_data_required=True,
+                certfile=os.path.join(root_dir, "server.crt"),
+                keyfile=os.path.join(root_dir, "server.key"),
+                # sendfile(2) and splice(2) bypass the TLS layer, so encrypted data channels can't use them
+                use_sendfile=False,
+                use_splice=False,
+            )
+        # Configure a subclass per run instead of the shared handler classes, so nothing leaks
+        # into the next start (including the SSL context cached on it)
+        handler = type(base_handler.__name__, (base_handler,), handler_attrs)
 
-            handler.tls_control_required = True
-            handler.tls_data_required = True
-            handler.certfile = os.path.join(root_dir, "server.crt")
-            handler.keyfile = os.path.join(root_dir, "server.key")
-        
-        server = FTPServer(("0.0.0.0", port), handler)
+        # IOLoop resolves to the best poller available (epoll on Linux, kqueue on BSD/macOS)
+        ioloop = IOLoop()
+        server = CatFTPServer(("0.0.0.0", port), handler, ioloop=ioloop)
+        if shutdown_event is not None:
+            threading.Thread(target=_stop_when_set, args=(server, shutdown_event), daemon=True).start()
         log(f"Starting {ADDON_NAME} on port {port}")
         server.serve_forever()
     except Exception as e:
         log(f"Error starting FTP server in run_ftp_server: {e}", level=xbmc.LOGERROR)
     finally:
         if server:
-            server.close_all()
\ No newline at end of file
+            server.close_all()
+        if dir_pool:
+            dir_pool.shutdown(wait=False)
\ No newline at end of file
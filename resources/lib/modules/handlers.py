@@ -0,0 +1,309 @@
+import collections
+import os
+import socket
+import sys
+from pyftpdlib.filesystems import FilesystemError
+from pyftpdlib.handlers import BufferedIteratorProducer, DTPHandler, FTPHandler
+from pyftpdlib.handlers import _FileReadWriteError, _is_ssl_sock, _strerror
+from pyftpdlib.ioloop import _ERRNOS_DISCONNECTED, _ERRNOS_RETRY
+from pyftpdlib.log import logger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def _read_sysctl(name: str):
+    try:
+        with open(f"/proc/sys/net/core/{name}") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+# Linux clamps SO_SNDBUF/SO_RCVBUF to these and switches off buffer autotuning once either is
+# set, so a smaller explicit size would end up worse than the kernel's own choice
+_WMEM_MAX = _read_sysctl("wmem_max")
+_RMEM_MAX = _read_sysctl("rmem_max")
+# Unreadable sysctls on Linux (Android's app sandbox, locked-down containers) mean the limit is
+# unknown rather than absent, so only platforms without them set the buffers blindly
+_LINUX = sys.platform.startswith("linux")
+
+
+def _buffer_fits(limit, size) -> bool:
+    if limit is None:
+        return not _LINUX
+    return limit >= size
+
+
+class CatDTPHandler(DTPHandler):
+    # Requested capacity of the pipe backing splice(2) uploads
+    splice_pipe_size = 1 << 20
+    # Kernel socket buffer size for data connections, so sendfile/splice can move bigger bursts
+    socket_buffer_size = 2 << 20
+
+    def __init__(self, sock, cmd_channel):
+        self._pipe = None
+        self._recv_buffer = None
+        self._splice_size = self.ac_in_buffer_size
+        self._set_socket_buffers(sock)
+        DTPHandler.__init__(self, sock, cmd_channel)
+
+    def _set_socket_buffers(self, sock):
+        size = self.socket_buffer_size
+        if not size:
+            return
+        try:
+            if _buffer_fits(_WMEM_MAX, size):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, size)
+            if _buffer_fits(_RMEM_MAX, size):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+        except OSError:
+            # The connection may already be gone; DTPHandler.__init__ deals with that
+            pass
+
+    def use_splice(self) -> bool:
+        if not getattr(self.cmd_channel, "use_splice", False):
+            return False
+        # ASCII uploads need line endings rewritten on the fly
+        if self._data_wrapper is not None:
+            return False
+        # Encrypted data has to be read back through the TLS layer
+        if _is_ssl_sock(self.socket):
+            return False
+        # splice(2) refuses to write to files opened with O_APPEND (APPE)
+        if "a" in getattr(self.file_obj, "mode", "a"):
+            return False
+        try:
+            self.file_obj.fileno()
+        except (AttributeError, OSError, ValueError):
+            return False
+        return True
+
+    def enable_receiving(self, type, cmd):
+        DTPHandler.enable_receiving(self, type, cmd)
+        if self.use_splice():
+            self.recv_file_splice(self.file_obj.fileno())
+        elif self._data_wrapper is None and not _is_ssl_sock(self.socket):
+            self.recv_file_buffered()
+
+    def recv_file_splice(self, fd_out: int):
+        """Route incoming data socket -> pipe -> fd_out without copying it
+        through userspace.
+        """
+        self._pipe = os.pipe()
+        if fcntl is not None and hasattr(fcntl, "F_SETPIPE_SZ"):
+            try:
+                self._splice_size = fcntl.fcntl(self._pipe[1], fcntl.F_SETPIPE_SZ, self.splice_pipe_size)
+            except OSError:
+                # Above /proc/sys/fs/pipe-max-size; keep the default capacity
+                pass
+        self._filefd = fd_out
+        self.handle_read_event = self._handle_read_splice
+
+    def _handle_read_splice(self):
+        try:
+            received = os.splice(
+                self._fileno, self._pipe[1], self._splice_size, flags=os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK
+            )
+        except BlockingIOError:
+            return
+        except OSError as err:
+            if err.errno in _ERRNOS_DISCONNECTED:
+                self.handle_close()
+                return
+            raise
+        if not received:
+            self.handle_close()
+            return
+        self.tot_bytes_received += received
+        try:
+            while received:
+                received -= os.splice(self._pipe[0], self._filefd, received, flags=os.SPLICE_F_MOVE)
+        except OSError as err:
+            raise _FileReadWriteError(err)
+
+    def recv_file_buffered(self):
+        """Receive into a reusable buffer taken from the server's pool instead of
+        allocating a new bytes object for every recv().
+        """
+        pool = getattr(self.cmd_channel.server, "_buf_pool", None)
+        if pool:
+            self._recv_buffer = pool.pop()
+        else:
+            self._recv_buffer = bytearray(self.ac_in_buffer_size)
+        self.handle_read_event = self._handle_read_buffered
+
+    def _handle_read_buffered(self):
+        try:
+            received = self.socket.recv_into(self._recv_buffer)
+        except OSError as err:
+            if err.errno in _ERRNOS_RETRY:
+                return
+            if err.errno in _ERRNOS_DISCONNECTED:
+                self.handle_close()
+                return
+            raise
+        if not received:
+            self.handle_close()
+            return
+        self.tot_bytes_received += received
+        try:
+            with memoryview(self._recv_buffer) as view:
+                self.file_obj.write(view[:received])
+        except OSError as err:
+            raise _FileReadWriteError(err)
+
+    def close(self):
+        if self._pipe is not None:
+            for fd in self._pipe:
+                os.close(fd)
+            self._pipe = None
+        if self._recv_buffer is not None:
+            pool = getattr(self.cmd_channel.server, "_buf_pool", None)
+            if pool is not None:
+                pool.append(self._recv_buffer)
+            self._recv_buffer = None
+        DTPHandler.close(self)
+
+
+class CatFTPHandler(FTPHandler):
+    dtp_handler = CatDTPHandler
+    use_splice = hasattr(os, "splice")
+    # Executor running directory listings off the IO loop; None lists inline like pyftpdlib
+    dir_pool = None
+    # Commands received while a dir_pool job is pending; replayed in order once it's done
+    _deferred_commands = None
+    # Leads every session log line. Used instead of log_prefix, which pyftpdlib %-formats
+    # against the whole instance __dict__ for each line.
+    log_tag = "[pyftpdlib]"
+
+    def log(self, msg, logfun=logger.info):
+        logfun(self.log_tag + ": [" + self.username + "]@" + self.remote_ip + " - " + msg)
+
+    def logline(self, msg, logfun=logger.debug):
+        if self._log_debug:
+            logfun(self.log_tag + ": [" + self.username + "]@" + self.remote_ip + " - " + msg)
+
+    def logerror(self, msg):
+        logger.error(self.log_tag + ": [" + self.username + "]@" + self.remote_ip + " - " + msg)
+
+    def pre_process_command(self, line, cmd, arg):
+        if self._deferred_commands is not None:
+            # asynchat keeps dispatching lines already in its buffer after del_channel()
+            self._deferred_commands.append((line, cmd, arg))
+            return
+        FTPHandler.pre_process_command(self, line, cmd, arg)
+
+    def _run_in_pool(self, function, callback, *args):
+        """Run function(*args) on dir_pool, then callback(result) back on the IO loop's thread.
+        Until then the control channel stops reading and commands already received are held
+        back, so replies keep the order of the commands.
+        """
+        self._deferred_commands = collections.deque()
+        self.del_channel()
+
+        def done(future):
+            self.server.call_from_thread(lambda: self._on_pool_done(future, callback))
+
+        self.dir_pool.submit(function, *args).add_done_callback(done)
+
+    def _on_pool_done(self, future, callback):
+        if self._closed:
+            return
+        deferred, self._deferred_commands = self._deferred_commands, None
+        self.add_channel()
+        try:
+            result = future.result()
+        except (OSError, FilesystemError) as err:
+            self.respond("550 %s." % _strerror(err))
+        except Exception:
+            self.handle_error()
+        else:
+            callback(result)
+        # Stop replaying if a command hands off to the pool again; pre_process_command()
+        # then queues the rest behind the new job
+        while deferred and not self._closed:
+            if self._deferred_commands is not None:
+                self._deferred_commands.extend(deferred)
+                break
+            self.pre_process_command(*deferred.popleft())
+
+    def _list_lines(self, path):
+        if self.fs.isdir(path):
+            listing = self.run_as_current_user(self.fs.listdir, path)
+            listing.sort()
+            return list(self.fs.format_list(path, listing))
+        basedir, filename = os.path.split(path)
+        self.fs.lstat(path)
+        return list(self.fs.format_list(basedir, [filename]))
+
+    def _mlsd_lines(self, path, perms):
+        if not self.fs.isdir(path):
+            return None
+        listing = self.run_as_current_user(self.fs.listdir, path)
+        return list(self.fs.format_mlsx(path, listing, perms, self._current_facts))
+
+    def ftp_LIST(self, path):
+        if self.dir_pool is None:
+            return FTPHandler.ftp_LIST(self, path)
+
+        def send(lines):
+            self.push_dtp_data(BufferedIteratorProducer(iter(lines)), isproducer=True, cmd="LIST")
+
+        self._run_in_pool(self._list_lines, send, path)
+        return path
+
+    def ftp_MLSD(self, path):
+        if self.dir_pool is None:
+            return FTPHandler.ftp_MLSD(self, path)
+
+        def send(lines):
+            if lines is None:
+                # RFC-3659 requires 501 if path is not a directory
+                self.respond("501 No such directory.")
+            else:
+                self.push_dtp_data(BufferedIteratorProducer(iter(lines)), isproducer=True, cmd="MLSD")
+
+        self._run_in_pool(self._mlsd_lines, send, path, self.authorizer.get_perms(self.username))
+        return path
+
+
+try:
+    from OpenSSL import SSL
+    from pyftpdlib.handlers import TLS_DTPHandler, TLS_FTPHandler
+except ImportError:
+    # pyftpdlib only provides FTPS when pyOpenSSL is installed
+    SSL = None
+
+
+if SSL is not None:
+
+    class CatTLS_DTPHandler(TLS_DTPHandler, CatDTPHandler):
+        pass
+
+    class CatTLS_FTPHandler(TLS_FTPHandler, CatFTPHandler):
+        dtp_handler = CatTLS_DTPHandler
+        ssl_options = TLS_FTPHandler.ssl_options | SSL.OP_NO_TLSv1 | SSL.OP_NO_TLSv1_1
+        ssl_ciphers = b"ECDHE+AESGCM:ECDHE+CHACHA20"
+
+        @classmethod
+        def get_ssl_context(cls):
+            # Built once and shared by every control and data connection. The fixed session id
+            # lets data channels resume the control channel's session instead of doing a full
+            # handshake per transfer.
+            if cls.ssl_context is None:
+                if cls.certfile is None:
+                    raise ValueError("at least certfile must be specified")
+                context = SSL.Context(cls.ssl_protocol)
+                context.use_certificate_chain_file(cls.certfile)
+                context.use_privatekey_file(cls.keyfile or cls.certfile)
+                context.set_options(cls.ssl_options)
+                context.set_cipher_list(cls.ssl_ciphers)
+                context.set_session_id(b"catftp")
+                cls.ssl_context = context
+            return cls.ssl_context
+
+else:
+    CatTLS_DTPHandler = CatTLS_FTPHandler = None
@@ -1,6 +1,8 @@
 import xbmc
 from modules.constants import ADDON_NAME
 
+_PREFIX = f"[{ADDON_NAME}]: "
+
 
 def log(message: str, level = xbmc.LOGINFO):
-    xbmc.log(f"[{ADDON_NAME}]: {message}", level)
+    xbmc.log(_PREFIX + message, level)
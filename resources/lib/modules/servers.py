@@ -0,0 +1,193 @@
+import collections
+import logging
+import os
+import socket
+from pyftpdlib.ioloop import AsyncChat
+from pyftpdlib.log import PREFIX, PREFIX_MPROC, config_logging, is_logging_configured, logger
+from pyftpdlib.servers import FTPServer, ThreadedFTPServer
+
+try:
+    from pyftpdlib.servers import MultiprocessFTPServer as _MultiprocessFTPServer
+except ImportError:
+    # Only defined on POSIX with a working multiprocessing module
+    _MultiprocessFTPServer = None
+
+
+def _fqname(obj) -> str:
+    cls = obj if isinstance(obj, type) else type(obj)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class _Waker(AsyncChat):
+    """Self-pipe that lets other threads run callbacks on the IO loop's thread."""
+
+    def __init__(self, ioloop):
+        rsock, self._wsock = socket.socketpair()
+        self._wsock.setblocking(False)
+        self._callbacks = collections.deque()
+        AsyncChat.__init__(self, rsock, ioloop=ioloop)
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        try:
+            data = self.socket.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        while self._callbacks:
+            callback = self._callbacks.popleft()
+            try:
+                callback()
+            except Exception:
+                logger.exception("error in callback scheduled on the IO loop")
+        if not data:
+            # stop() closed the write end; don't keep polling a socket stuck at EOF
+            self.close()
+
+    def wake(self, callback=None):
+        if callback is not None:
+            self._callbacks.append(callback)
+        try:
+            self._wsock.send(b"\0")
+        except (AttributeError, OSError):
+            # Buffer full means a wakeup is already pending; None/closed means we're shutting down
+            pass
+
+    def close_writer(self):
+        if self._wsock is not None:
+            self._wsock.close()
+            self._wsock = None
+
+    def close(self):
+        AsyncChat.close(self)
+        self.close_writer()
+
+
+class _IPMap(collections.Counter):
+    """Connection count per remote IP. Disconnects only queue a decrement, which flush()
+    applies in one pass right before the counts are next read.
+    """
+
+    def __init__(self):
+        collections.Counter.__init__(self)
+        self._pending = collections.Counter()
+
+    def remove(self, ip):
+        # FTPHandler.close() still calls ip_map.remove(ip) on disconnect
+        self._pending[ip] += 1
+
+    def flush(self):
+        if not self._pending:
+            return
+        for ip, closed in self._pending.items():
+            count = self[ip] - closed
+            if count > 0:
+                self[ip] = count
+            else:
+                del self[ip]
+        self._pending.clear()
+
+
+class CatFTPServer(FTPServer):
+    def __init__(self, address_or_socket, handler, ioloop=None, backlog=100):
+        FTPServer.__init__(self, address_or_socket, handler, ioloop=ioloop, backlog=backlog)
+        # Connection count per remote IP, so max_cons_per_ip checks don't scan a list
+        self.ip_map = _IPMap()
+        self._socket_map = self.ioloop.socket_map
+        # Receive buffers handed back by closed data channels, reused by the next upload
+        self._buf_pool = collections.deque(maxlen=self.max_cons or None)
+        self._waker = _Waker(self.ioloop)
+        # Sockets in the IO loop's map that belong to the server itself, not to clients
+        self._internal_socks = 1
+
+    def call_from_thread(self, callback):
+        """Schedule callback to run on the IO loop's thread; safe to call from any thread."""
+        self._waker.wake(callback)
+
+    def stop(self):
+        """Thread-safe counterpart to close_all()."""
+        self._waker.wake(self.close_all)
+        self._waker.close_writer()
+
+    def _log_start(self, prefork=False):
+        # Resolve everything off the handler class once instead of per log call
+        h = self.handler
+        certfile = getattr(h, "certfile", None)
+        keyfile = getattr(h, "keyfile", None)
+        passive_ports = h.passive_ports
+        model_is_threaded = isinstance(self, ThreadedFTPServer)
+        model_is_mproc = _MultiprocessFTPServer is not None and isinstance(self, _MultiprocessFTPServer)
+
+        if not is_logging_configured():
+            config_logging(prefix=PREFIX_MPROC if prefork else PREFIX)
+
+        pasv_ports = f"{passive_ports[0]}->{passive_ports[-1]}" if passive_ports else None
+        model = "prefork + " if prefork else ""
+        if model_is_threaded:
+            model += "multi-thread"
+        elif model_is_mproc:
+            model += "multi-process"
+        else:
+            model += "async"
+        logger.info("concurrency model: " + model)
+        logger.info("masquerade (NAT) address: %s", h.masquerade_address)
+        logger.info("passive ports: %s", pasv_ports)
+
+        # Everything below is debug-only; skip the attribute lookups entirely when it's filtered
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        logger.debug("poller: %r", _fqname(self.ioloop))
+        logger.debug("authorizer: %r", _fqname(h.authorizer))
+        if os.name == "posix":
+            logger.debug("use sendfile(2): %s", h.use_sendfile)
+        logger.debug("handler: %r", _fqname(h))
+        logger.debug("max connections: %s", self.max_cons or "unlimited")
+        logger.debug("max connections per ip: %s", self.max_cons_per_ip or "unlimited")
+        logger.debug("timeout: %s", h.timeout or "unlimited")
+        logger.debug("banner: %r", h.banner)
+        logger.debug("max login attempts: %r", h.max_login_attempts)
+        if certfile:
+            logger.debug("SSL certfile: %r", certfile)
+        if keyfile:
+            logger.debug("SSL keyfile: %r", keyfile)
+
+    def handle_error(self):
+        """Called to handle any uncaught exceptions."""
+        logger.exception("unhandled exception in FTP server")
+        self.close()
+
+    def handle_accepted(self, sock, addr):
+        handler = None
+        try:
+            handler = self.handler(sock, self, ioloop=self.ioloop)
+            if not handler.connected:
+                return
+
+            ip = addr[0]
+            self.ip_map.flush()
+            self.ip_map[ip] += 1
+
+            # Inlined _accept_new_cons(): one len() on the cached map, no extra method calls
+            if self.max_cons and len(self._socket_map) - self._internal_socks > self.max_cons:
+                handler.handle_max_cons()
+                return
+
+            if self.max_cons_per_ip and self.ip_map[ip] > self.max_cons_per_ip:
+                handler.handle_max_cons_per_ip()
+                return
+
+            try:
+                handler.handle()
+            except Exception:
+                handler.handle_error()
+            else:
+                return handler
+        except Exception:
+            # Log and drop the connection rather than tearing down the server. exc_info leaves
+            # formatting the traceback to logging, which skips it if the record is filtered.
+            logger.error("error while accepting a connection", exc_info=True)
+            # The handler's close() also queues the ip_map decrement. Without a handler the
+            # IP was never counted, so there's nothing to undo.
+            if handler is not None:
+                handler.close()
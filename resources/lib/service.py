@@ -1,23 +1,29 @@
-import xbmcvfs
+import threading
 import xbmc
 from modules.logger import log
 from modules.ftp_server import run_ftp_server
-from modules.constants import ADDON_NAME, addon
+from modules.constants import ADDON_NAME, HOME_PATH, addon
 
 
 if __name__ == "__main__":
     monitor = xbmc.Monitor()
 
-    # TODO: Move these
-    ftp_root = xbmcvfs.translatePath("special://home/")
-    ftp_port = addon.getSetting("ftp_port")
-    ftp_username = addon.getSetting("ftp_username")
-    ftp_password = addon.getSetting("ftp_password")
+    # One typed read per setting; Kodi parses the values instead of us round-tripping strings
+    ftp_port = addon.getSettingInt("ftp_port")
+    ftp_username = addon.getSettingString("ftp_username")
+    ftp_password = addon.getSettingString("ftp_password")
     ftp_secure = addon.getSettingBool("ftp_secure")
 
-    server = run_ftp_server(ftp_root, int(ftp_port), ftp_username, ftp_password, ftp_secure)
+    shutdown_event = threading.Event()
+    server_thread = threading.Thread(
+        target=run_ftp_server,
+        args=(HOME_PATH, ftp_port, ftp_username, ftp_password, ftp_secure, shutdown_event),
+        daemon=True,
+    )
+    server_thread.start()
 
-    while not monitor.abortRequested():
-        if monitor.waitForAbort(5):
-            break
+    # Sleep until Kodi asks us to exit instead of waking up every few seconds
+    monitor.waitForAbort()
     log(f"Stopping {ADDON_NAME}")
+    shutdown_event.set()
+    server_thread.join(5)
@@ -0,0 +1,83 @@
+import os
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "lib"))
+
+from modules.authorizers import SingleUserAuthorizer  # noqa: E402
+from modules.handlers import CatFTPHandler  # noqa: E402
+from modules.servers import CatFTPServer  # noqa: E402
+
+
+class _SlowListHandler(CatFTPHandler):
+    # Keep the pool job pending long enough for pipelined commands to arrive behind it
+    def _list_lines(self, path):
+        time.sleep(0.2)
+        return CatFTPHandler._list_lines(self, path)
+
+
+class PipelinedCommandsTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for name in ("a", "b", "c"):
+            open(os.path.join(self.root, name), "w").close()
+        self.dir_pool = ThreadPoolExecutor(max_workers=1)
+        handler = type(
+            "Handler",
+            (_SlowListHandler,),
+            {"authorizer": SingleUserAuthorizer("user", "pass", self.root), "dir_pool": self.dir_pool},
+        )
+        self.server = CatFTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={"handle_exit": False})
+        self.thread.start()
+        self.sock = socket.create_connection(self.server.address[:2], timeout=5)
+        self.file = self.sock.makefile("rb")
+
+    def tearDown(self):
+        self.file.close()
+        self.sock.close()
+        self.server.stop()
+        self.thread.join(5)
+        self.dir_pool.shutdown()
+
+    def read_reply(self) -> str:
+        return self.file.readline().decode().rstrip("\r\n")
+
+    def command(self, line: str) -> str:
+        self.sock.sendall(line.encode() + b"\r\n")
+        return self.read_reply()
+
+    def open_data_channel(self) -> socket.socket:
+        reply = self.command("PASV")
+        numbers = [int(n) for n in re.search(r"\((\d+(?:,\d+){5})\)", reply).group(1).split(",")]
+        return socket.create_connection((".".join(map(str, numbers[:4])), numbers[4] << 8 | numbers[5]), timeout=5)
+
+    def test_replies_keep_command_order(self):
+        self.assertTrue(self.read_reply().startswith("220"))
+        self.assertTrue(self.command("USER user").startswith("331"))
+        self.assertTrue(self.command("PASS pass").startswith("230"))
+        for _ in range(2):
+            data = self.open_data_channel()
+            self.sock.sendall(b"LIST\r\nPWD\r\nNOOP\r\n")
+            codes = [self.read_reply()[:3] for _ in range(4)]
+            listing = b""
+            while True:
+                chunk = data.recv(4096)
+                if not chunk:
+                    break
+                listing += chunk
+            data.close()
+            self.assertEqual(codes[0], "125")
+            self.assertLess(codes.index("257"), codes.index("200"))
+            self.assertEqual(sorted(codes), ["125", "200", "226", "257"])
+            self.assertEqual(len(listing.splitlines()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()